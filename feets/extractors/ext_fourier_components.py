@@ -42,15 +42,411 @@ __doc__ = """"""
 # IMPORTS
 # =============================================================================
 
+import functools
+from collections import OrderedDict
+
 import numpy as np
 
-from scipy.signal import find_peaks
-from scipy.optimize import curve_fit
+
+try:
+    import finufft
+except ImportError:  # pragma: no cover
+    finufft = None
+
+try:
+    import nifty_ls
+except ImportError:  # pragma: no cover
+    nifty_ls = None
 
 from .ext_lomb_scargle import lscargle
 from .core import Extractor
 
 
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+NIFTY_MODEL_KWDS = ("fit_mean", "center_data")
+
+NIFTY_AUTOPOWER_KWDS = (
+    "normalization", "samples_per_peak", "nyquist_factor",
+    "minimum_frequency", "maximum_frequency")
+
+NUFFT_EPS = 1e-9
+
+NUFFT_EPS32 = 1e-5
+
+UNRESOLVED_QUADRATURE = 1e-6
+
+FREQ_GRID_CACHE_SIZE = 64
+
+PLANNER_CACHE_SIZE = 8
+
+_planner_cache = OrderedDict()
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+@functools.lru_cache(maxsize=FREQ_GRID_CACHE_SIZE)
+def _build_freq_grid(t_min, t_max, n, samples_per_peak=5, nyquist_factor=5,
+                     minimum_frequency=None, maximum_frequency=None):
+    """Return the ``(fmin, df, frequency)`` grid that astropy's
+    ``LombScargle.autofrequency`` would build for ``n`` times between
+    ``t_min`` and ``t_max``.
+
+    The grid is cached, so ``frequency`` is read-only.
+
+    """
+    baseline = t_max - t_min
+    df = 1.0 / baseline / samples_per_peak
+    if minimum_frequency is None:
+        minimum_frequency = 0.5 * df
+    if maximum_frequency is None:
+        avg_nyquist = 0.5 * n / baseline
+        maximum_frequency = nyquist_factor * avg_nyquist
+    Nf = 1 + int(np.round((maximum_frequency - minimum_frequency) / df))
+
+    frequency = minimum_frequency + df * np.arange(Nf)
+    frequency.flags.writeable = False
+    return minimum_frequency, df, frequency
+
+
+def _autofrequency(time, **grid_kwds):
+    """Return the ``(fmin, df, Nf)`` frequency grid that astropy's
+    ``LombScargle.autofrequency`` would build for the given times.
+
+    """
+    fmin, df, frequency = _build_freq_grid(
+        float(np.min(time)), float(np.max(time)), len(time), **grid_kwds)
+    return fmin, df, len(frequency)
+
+
+def _lscargle_fast(time, magnitude, error=None,
+                   model_kwds=None, autopower_kwds=None, backend="finufft"):
+    """Drop-in replacement of ``lscargle`` backed by the NUFFT periodogram of
+    ``nifty_ls``. ``backend`` is any of the ``nifty_ls`` backends, like
+    ``"finufft"`` or ``"cufinufft"`` to run on a GPU.
+
+    Falls back to ``lscargle`` when ``nifty_ls`` is not installed or when
+    the keywords request something that only astropy provides.
+
+    """
+    model_kwds = model_kwds or {}
+    autopower_kwds = autopower_kwds or {}
+
+    unsupported = (
+        set(model_kwds).difference(NIFTY_MODEL_KWDS) or
+        set(autopower_kwds).difference(NIFTY_AUTOPOWER_KWDS))
+    if nifty_ls is None or unsupported:
+        return lscargle(
+            time, magnitude, error=error,
+            model_kwds=model_kwds, autopower_kwds=autopower_kwds)
+
+    autopower_kwds = dict(autopower_kwds)
+    normalization = autopower_kwds.pop("normalization", "standard")
+    fmin, df, Nf = _autofrequency(time, **autopower_kwds)
+
+    time = np.asarray(time, dtype=np.float64)
+    magnitude = np.asarray(magnitude, dtype=np.float64)
+    if error is not None:
+        error = np.asarray(error, dtype=np.float64)
+
+    result = nifty_ls.lombscargle(
+        time, magnitude, dy=error,
+        fmin=fmin, fmax=fmin + df * (Nf - 1), Nf=Nf,
+        normalization=normalization, backend=backend, **model_kwds)
+
+    frequency, power = result.freq(), result.power
+    fmax = np.argmax(power)
+
+    return frequency, power, fmax
+
+
+def _nufft_terms(time, weights, fmin, df, Nf, fit_mean):
+    """Plan the NUFFT over the ``Nf`` frequencies starting at ``fmin`` and
+    compute the periodogram terms that depend only on the times and the
+    weights.
+
+    """
+    # finufft evaluates the Nf modes centered on zero, so the phases are
+    # shifted to make the first mode land on fmin
+    t1 = 2 * np.pi * df * time
+    shift = Nf // 2 + fmin / df
+    shift1 = np.exp(1j * shift * t1)
+
+    plan = finufft.Plan(1, (Nf,), eps=NUFFT_EPS, dtype=np.complex128)
+    plan.setpts(2 * t1)
+    f2 = plan.execute(weights * shift1 * shift1)
+
+    plan.setpts(t1)
+    if fit_mean:
+        fw = plan.execute(weights * shift1)
+        tan_2omega_tau = (f2.imag - 2 * fw.imag * fw.real) / (
+            f2.real - (fw.real * fw.real - fw.imag * fw.imag))
+    else:
+        tan_2omega_tau = f2.imag / f2.real
+
+    S2w = tan_2omega_tau / np.sqrt(1 + tan_2omega_tau * tan_2omega_tau)
+    C2w = 1 / np.sqrt(1 + tan_2omega_tau * tan_2omega_tau)
+    Cw = np.sqrt(0.5) * np.sqrt(1 + C2w)
+    Sw = np.sqrt(0.5) * np.sign(S2w) * np.sqrt(1 - C2w)
+
+    CC = 0.5 * (1 + f2.real * C2w + f2.imag * S2w)
+    SS = 0.5 * (1 - f2.real * C2w - f2.imag * S2w)
+    if fit_mean:
+        CC -= (fw.real * Cw + fw.imag * Sw) ** 2
+        SS -= (fw.imag * Cw - fw.real * Sw) ** 2
+
+    # a quadrature with (almost) no leverage, like the sine at the Nyquist
+    # frequency of a regular sampling, can't be resolved from a single
+    # precision transform, so it is left out of the power
+    CC[CC < UNRESOLVED_QUADRATURE] = np.inf
+    SS[SS < UNRESOLVED_QUADRATURE] = np.inf
+
+    # only the transform of the magnitudes runs once per call, so that one
+    # is planned in single precision
+    plan32 = finufft.Plan(1, (Nf,), eps=NUFFT_EPS32, dtype=np.complex64)
+    plan32.setpts(t1.astype(np.float32))
+    shift1 = shift1.astype(np.complex64)
+
+    return plan32, shift1, Cw, Sw, CC, SS
+
+
+def _lscargle_planner(time, error=None, model_kwds=None, autopower_kwds=None,
+                      backend="finufft"):
+    """Build a Lomb-Scargle periodogram bound to ``time``.
+
+    Returns a function ``ls(magnitude, freq_range=None)`` with the same
+    output as ``lscargle``. If ``freq_range`` is given only the frequencies
+    of the grid inside that range are evaluated.
+
+    The NUFFT plans and every trigonometric sum that depends only on the
+    times and the errors are computed once per frequency range, so each call
+    executes a single transform over the new magnitudes. This follows the
+    Press & Rybicki formulation used by ``nifty_ls``.
+
+    For any other ``backend``, or when ``finufft`` is not available (or the
+    keywords are not supported), every call is delegated to
+    ``_lscargle_fast``.
+
+    """
+    model_kwds = model_kwds or {}
+    autopower_kwds = autopower_kwds or {}
+
+    grid_kwds = {
+        k: v for k, v in autopower_kwds.items()
+        if k in NIFTY_AUTOPOWER_KWDS and k != "normalization"}
+    fmin, df, frequency = _build_freq_grid(
+        float(np.min(time)), float(np.max(time)), len(time), **grid_kwds)
+    Nf = len(frequency)
+
+    def subgrid(freq_range):
+        if freq_range is None:
+            return 0, Nf
+        lo = np.searchsorted(frequency, freq_range[0], side="left")
+        hi = np.searchsorted(frequency, freq_range[1], side="right")
+        return lo, max(lo, hi)
+
+    unsupported = (
+        set(model_kwds).difference(NIFTY_MODEL_KWDS) or
+        set(autopower_kwds).difference(NIFTY_AUTOPOWER_KWDS))
+    if backend != "finufft" or finufft is None or unsupported:
+        def ls(magnitude, freq_range=None):
+            lo, hi = subgrid(freq_range)
+            if lo == hi:
+                return frequency[lo:hi], np.empty(0), None
+            kwds = dict(
+                autopower_kwds,
+                minimum_frequency=frequency[lo],
+                maximum_frequency=frequency[hi - 1])
+            return _lscargle_fast(
+                time, magnitude, error=error,
+                model_kwds=model_kwds, autopower_kwds=kwds, backend=backend)
+        return ls
+
+    normalization = autopower_kwds.get("normalization", "standard")
+    if normalization not in ("standard", "model", "log", "psd"):
+        raise ValueError(f"Unknown normalization: {normalization}")
+
+    fit_mean = model_kwds.get("fit_mean", True)
+    center_data = model_kwds.get("center_data", True)
+
+    # the power is invariant to time shifts, and starting at zero keeps
+    # the NUFFT points close to the origin
+    time = np.asarray(time, dtype=np.float64)
+    time = time - np.min(time)
+
+    weights = (
+        np.ones_like(time) if error is None else
+        np.asarray(error, dtype=np.float64) ** -2.0)
+    weights_sum = np.sum(weights)
+    weights = weights / weights_sum
+
+    # the full grid is always needed, the sub-grids are planned on demand
+    terms = {(0, Nf): _nufft_terms(time, weights, fmin, df, Nf, fit_mean)}
+
+    def ls(magnitude, freq_range=None):
+        lo, hi = subgrid(freq_range)
+        if lo == hi:
+            return frequency[lo:hi], np.empty(0), None
+        if (lo, hi) not in terms:
+            terms[(lo, hi)] = _nufft_terms(
+                time, weights, frequency[lo], df, hi - lo, fit_mean)
+        plan, shift1, Cw, Sw, CC, SS = terms[(lo, hi)]
+
+        magnitude = np.asarray(magnitude, dtype=np.float64)
+        if center_data or fit_mean:
+            magnitude = magnitude - np.dot(weights, magnitude)
+        YY = np.dot(weights, magnitude * magnitude)
+
+        weighted = (weights * magnitude).astype(np.float32)
+        f1 = plan.execute(weighted * shift1)
+        YC = f1.real * Cw + f1.imag * Sw
+        YS = f1.imag * Cw - f1.real * Sw
+
+        power = YC * YC / CC + YS * YS / SS
+        if normalization == "standard":
+            power /= YY
+        elif normalization == "model":
+            power /= YY - power
+        elif normalization == "log":
+            power = -np.log(1 - power / YY)
+        else:
+            power *= 0.5 * weights_sum
+
+        fmax = np.argmax(power)
+        return frequency[lo:hi], power, fmax
+
+    return ls
+
+
+def _argmax_peak(power, allowed=None):
+    """Index of the highest local maximum of ``power`` (or -1 if there is
+    none). ``allowed`` optionally flags the bins that may hold that peak.
+
+    """
+    if len(power) < 3:
+        return -1
+
+    inner = power[1:-1]
+    is_peak = (inner > power[:-2]) & (inner > power[2:])
+    if allowed is not None:
+        is_peak &= allowed[1:-1]
+
+    candidates = np.where(is_peak, inner, -np.inf)
+    highest = np.argmax(candidates)
+    return int(highest) + 1 if is_peak[highest] else -1
+
+
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in obj.items()))
+    return obj
+
+
+def _cached_lscargle_planner(time, error=None, model_kwds=None,
+                             autopower_kwds=None, backend="finufft"):
+    """Same as ``_lscargle_planner`` but the planned periodograms are cached,
+    so light curves that share the same times (as usual within a survey)
+    share the frequency grid and the NUFFT plans.
+
+    """
+    time = np.asarray(time, dtype=np.float64)
+    if error is not None:
+        error = np.asarray(error, dtype=np.float64)
+    kwds = {
+        "model_kwds": model_kwds or {}, "autopower_kwds": autopower_kwds or {}}
+
+    key = (
+        time.tobytes(), None if error is None else error.tobytes(),
+        _freeze(kwds), backend)
+    try:
+        planner = _planner_cache.pop(key)
+    except KeyError:
+        planner = _lscargle_planner(time, error=error, backend=backend, **kwds)
+    except TypeError:
+        # unhashable keywords, nothing to cache
+        return _lscargle_planner(time, error=error, backend=backend, **kwds)
+
+    _planner_cache[key] = planner
+    while len(_planner_cache) > PLANNER_CACHE_SIZE:
+        _planner_cache.popitem(last=False)
+    return planner
+
+
+def _calculate_snr(power, fmax_idx, half_window):
+    """Ratio between the power of the peak at ``fmax_idx`` and the mean power
+    of the ``half_window`` bins at each side of it.
+
+    """
+    peak_power = power[fmax_idx]
+
+    # excluding the peak itself from the noise calculation
+    lo = max(fmax_idx - half_window, 0)
+    hi = fmax_idx + half_window + 1
+    noise_power = np.concatenate((power[lo:fmax_idx], power[fmax_idx + 1:hi]))
+
+    if noise_power.size == 0:
+        # avoiding division by zero, treat as infinitely significant
+        return np.inf
+
+    average_noise_power = np.mean(noise_power)
+
+    snr = peak_power / average_noise_power
+    return snr
+
+
+def _allowed_bins(frequency, known, duplicate_rtol, peak_width=0.0):
+    """Flag the bins of ``frequency`` that don't fall on the peak of an
+    already extracted (``known``) frequency. The whitening can't remove a
+    non-sinusoidal signal entirely, and while the residual power at the
+    fitted frequency drops to zero, the leftover power peaks elsewhere in
+    the main lobe, ``peak_width`` (about one over the baseline) around it.
+
+    """
+    # frequencies that were not found are NaN
+    known = np.asarray(known, dtype=float)
+    known = known[~np.isnan(known)]
+    if not len(known) or len(frequency) < 2:
+        return None
+    df = frequency[1] - frequency[0]
+    band = np.maximum(duplicate_rtol * known, max(peak_width, df))
+    lo = np.searchsorted(frequency, known - band, side="left")
+    hi = np.searchsorted(frequency, known + band, side="right")
+
+    allowed = np.ones(len(frequency), dtype=bool)
+    for start, stop in zip(lo, hi):
+        allowed[start:stop] = False
+    return allowed
+
+
+def _get_significant_frequency(ls, magnitude, snr_threshold, window_size,
+                               freq_range=None, known=(),
+                               duplicate_rtol=1e-3, peak_width=0.0):
+    """Highest peak of the periodogram ``ls`` of ``magnitude`` inside
+    ``freq_range``, only if its SNR reaches ``snr_threshold``.
+
+    """
+    frequency, power, _ = ls(magnitude, freq_range)
+
+    highest_peak_idx = _argmax_peak(
+        power, _allowed_bins(frequency, known, duplicate_rtol, peak_width))
+
+    if highest_peak_idx < 0:
+        return None, None, None
+
+    # the grid is uniform, so the window is a fixed number of bins
+    df = frequency[1] - frequency[0]
+    snr = _calculate_snr(power, highest_peak_idx, int(window_size / df))
+
+    if snr < snr_threshold:
+        return None, None, None
+
+    return frequency[highest_peak_idx], power, highest_peak_idx
+
+
 # =============================================================================
 # EXTRACTOR CLASS
 # =============================================================================
@@ -137,7 +533,7 @@ class FourierComponents(Extractor):
     .. math::
 
         A_{i,j} = \sqrt{a_{i,j}^2 + b_{i,j}^2}\\
-        \textrm{PH}_{i,j} = \arctan(\frac{b_{i,j}}{a_{i,j}})
+        \textrm{PH}_{i,j} = \operatorname{arctan2}(b_{i,j}, a_{i,j})
 
     where :math:`A_{i,j}` is the amplitude of the :math:`j-th` harmonic of the
     :math:`i-th` frequency component and :math:`\textrm{PH}_{i,j}` is the
@@ -212,98 +608,100 @@ class FourierComponents(Extractor):
         "lscargle_kwds": {
             "autopower_kwds": {
                 "normalization": "standard",
-                "nyquist_factor": 1}}
+                "nyquist_factor": 1}},
+        "backend": "finufft",
     }
 
-    def _model(self, x, a, b, c, Freq):
-        return (a * np.sin(2 * np.pi * Freq * x) +
-                b * np.cos(2 * np.pi * Freq * x) + c)
-
-    def _yfunc_maker(self, Freq):
-        def func(x, a, b, c):
-            return (a * np.sin(2 * np.pi * Freq * x) +
-                    b * np.cos(2 * np.pi * Freq * x) + c)
-        return func
-
-    def _components(self, magnitude, time, lscargle_kwds, snr_threshold=3, window_size=0.5):
+    def warmup(self, time):
+        """Prepare the frequency grid and the periodogram plans for light
+        curves sampled at ``time``, so a batch of them reuses the same ones.
+
+        """
+        time = np.asarray(time, dtype=np.float64)
+        _cached_lscargle_planner(
+            time - np.min(time), backend=self.params["backend"],
+            **(self.params["lscargle_kwds"] or {}))
+
+    def _harmonics_buffers(self, size, n_harmonics=4):
+        harmonics = np.empty((n_harmonics, size), dtype=np.complex128)
+        design = np.empty((n_harmonics, size, 3))
+        design[..., 2] = 1.0
+        return harmonics, design
+
+    def _fit_harmonics(self, phase, magnitude, Freq, buffers=None):
+        # with the frequency fixed the model is linear in a, b and c, and
+        # every harmonic is fitted against the same magnitudes, so all of
+        # them are solved as a single batch of least squares problems
+        harmonics, design = buffers or self._harmonics_buffers(len(phase))
+
+        # exp(i j f phase) is the j-th power of exp(i f phase), so the sin
+        # and cos of the harmonics are built from the fundamental ones
+        np.multiply(phase, 1j * Freq, out=harmonics[0])
+        np.exp(harmonics[0], out=harmonics[0])
+        for j in range(1, len(harmonics)):
+            np.multiply(harmonics[j - 1], harmonics[0], out=harmonics[j])
+        design[..., 0] = harmonics.imag
+        design[..., 1] = harmonics.real
+
+        # same cutoff for small singular values as np.linalg.lstsq
+        rcond = np.finfo(float).eps * len(phase)
+        popts = np.linalg.pinv(design, rcond=rcond) @ magnitude
+
+        # the sum of the fitted harmonics, evaluated in a single pass
+        model = np.einsum("hni,hi->n", design, popts)
+        return popts, model
+
+    def _extract_one(self, Freq, phase, magnitude, buffers=None):
+        # fit the harmonics of Freq and whiten them from the magnitudes
+        popts, model = self._fit_harmonics(phase, magnitude, Freq, buffers)
+        np.subtract(magnitude, model, out=magnitude)
+        return popts
+
+    def _amplitudes_and_phases(self, coefs):
+        a, b = coefs[..., 0], coefs[..., 1]
+        A = np.hypot(a, b)
+        PH = np.arctan2(b, a)
+        # the difference of two phases in (-pi, pi] spans (-2pi, 2pi), so
+        # it is wrapped back to [-pi, pi)
+        scaledPH = (PH - PH[:, 0:1] + np.pi) % (2 * np.pi) - np.pi
+        return A, scaledPH
+
+    def _components(self, magnitude, time, lscargle_kwds, snr_threshold=3,
+                    window_size=0.5, backend="finufft", duplicate_rtol=1e-3):
+
+        # the residuals are updated in place, so work on a private copy
+        magnitude = np.array(magnitude, dtype=np.float64)
 
         time = time - np.min(time)
-        A, PH = [], []
-        freq = []
-
-        # helper function to calculate SNR
-        def calculate_snr(frequency, power, fmax_idx, window_size):
-            peak_power = power[fmax_idx]
-            fmax = frequency[fmax_idx]
-
-            # window around the peak
-            window_mask = (frequency >= (fmax - window_size)) & (frequency <= (fmax + window_size))
-
-            # excluding the peak itself from the noise calculation
-            noise_power = np.delete(power[window_mask], np.argmax(frequency[window_mask] == fmax))
-
-            if noise_power.size == 0:
-                return np.inf  # avoiding division by zero, treat as infinitely significant
-
-            average_noise_power = np.mean(noise_power)
-
-            snr = peak_power / average_noise_power
-            return snr
-
-        # helper function to get peaks w/o SNR check
-        def get_highest_frequency(time, magnitude, lscargle_kwds):
-            frequency, power, _ = lscargle(time, magnitude, **lscargle_kwds)
-    
-            peaks, _ = find_peaks(power)
-    
-            if len(peaks) == 0:
-                return None, None, None 
-
-            highest_peak_idx = peaks[np.argmax(power[peaks])]
-            highest_freq = frequency[highest_peak_idx]
-    
-            return highest_freq, power, highest_peak_idx
-
-        # helper function to get peaks with SNR check
-        def get_significant_frequency(time, magnitude, lscargle_kwds, snr_threshold, window_size, freq_range=None):
-            frequency, power, _ = lscargle(time, magnitude, **lscargle_kwds)
-
-            if freq_range:
-                mask = (frequency >= freq_range[0]) & (frequency <= freq_range[1])
-                frequency = frequency[mask]
-                power = power[mask]
-
-            peaks, _ = find_peaks(power)
-
-            if len(peaks) == 0:
-                return None, None, None
-
-            highest_peak_idx = peaks[np.argmax(power[peaks])]
-            snr = calculate_snr(frequency, power, highest_peak_idx, window_size)
-
-            if snr < snr_threshold:
-                return None, None, None
-
-            return frequency[highest_peak_idx], power, highest_peak_idx
-
-        # extracting the initial 3 frequencies
+        phase = 2 * np.pi * time
+        buffers = self._harmonics_buffers(len(time))
+        ls_with_plan = _cached_lscargle_planner(
+            time, backend=backend, **lscargle_kwds)
+        # half width of the main lobe of a periodogram peak, the leftovers of
+        # an already extracted frequency show up within it
+        peak_width = 1.0 / np.max(time)
+        # 5 frequencies x 4 harmonics x (a, b, c); the frequencies that are
+        # not found are left as NaN
+        coefs = np.full((5, 4, 3), np.nan)
+        freq = np.full(5, np.nan)
+
+        # extracting the initial 3 frequencies, stopping at the first one
+        # that can't be told apart from the noise. The range restricted
+        # search below still runs, a weaker but isolated peak in the missing
+        # range can pass the SNR check
+        stopped = False
         for i in range(3):
-            fundamental_Freq, power, fmax = get_highest_frequency(time, magnitude, lscargle_kwds)
+            fundamental_Freq, power, fmax = _get_significant_frequency(
+                ls_with_plan, magnitude, snr_threshold, window_size,
+                None, freq[:i], duplicate_rtol, peak_width)
 
-            Atemp, PHtemp = [], []
-            omagnitude = magnitude
-            freq.append(fundamental_Freq)
-
-            for j in range(4):
-                function_to_fit = self._yfunc_maker((j + 1) * fundamental_Freq)
-                popt0, popt1, popt2 = curve_fit(function_to_fit, time, omagnitude)[0][:3]
-                Atemp.append(np.sqrt(popt0 ** 2 + popt1 ** 2))
-                PHtemp.append(np.arctan(popt1 / popt0))
-                model = self._model(time, popt0, popt1, popt2, (j + 1) * fundamental_Freq)
-                magnitude = np.array(magnitude) - model
+            if fundamental_Freq is None:
+                stopped = True
+                break
 
-            A.append(Atemp)
-            PH.append(PHtemp)
+            freq[i] = fundamental_Freq
+            coefs[i] = self._extract_one(
+                fundamental_Freq, phase, magnitude, buffers)
 
         # checking the ranges of the extracted frequencies
         range1 = [0.4, 3.3]
@@ -311,100 +709,50 @@ class FourierComponents(Extractor):
         range1_present = any(range1[0] <= f <= range1[1] for f in freq)
         range2_present = any(range2[0] <= f <= range2[1] for f in freq)
 
-        # extracting 2 more frequencies based on the check
-        if range1_present and range2_present:
-            # if both ranges are present, extracting 2 more frequencies as before
-            for i in range(2):
-                fundamental_Freq, power, fmax = get_significant_frequency(time, magnitude, lscargle_kwds, snr_threshold, window_size)
-                
-                if fundamental_Freq is None:
-                    break
-
-                Atemp, PHtemp = [], []
-                omagnitude = magnitude
-                freq.append(fundamental_Freq)
-
-                for j in range(4):
-                    function_to_fit = self._yfunc_maker((j + 1) * fundamental_Freq)
-                    popt0, popt1, popt2 = curve_fit(function_to_fit, time, omagnitude)[0][:3]
-                    Atemp.append(np.sqrt(popt0 ** 2 + popt1 ** 2))
-                    PHtemp.append(np.arctan(popt1 / popt0))
-                    model = self._model(time, popt0, popt1, popt2, (j + 1) * fundamental_Freq)
-                    magnitude = np.array(magnitude) - model
-
-                A.append(Atemp)
-                PH.append(PHtemp)
+        # if both ranges are present, extracting 2 more frequencies as
+        # before, otherwise switching to the missing range
+        if not range1_present:
+            freq_range = range1
+        elif not range2_present:
+            freq_range = range2
         else:
-            # if one of the ranges is not present, switching to the missing range
-            if not range1_present:
-                # extracting from range 1
-                for i in range(2):
-                    fundamental_Freq, power, fmax = get_significant_frequency(time, magnitude, lscargle_kwds, snr_threshold, window_size, range1)
-                    if fundamental_Freq is None:
-                        break
-
-                    Atemp, PHtemp = [], []
-                    omagnitude = magnitude
-                    freq.append(fundamental_Freq)
-
-                    for j in range(4):
-                        function_to_fit = self._yfunc_maker((j + 1) * fundamental_Freq)
-                        popt0, popt1, popt2 = curve_fit(function_to_fit, time, omagnitude)[0][:3]
-                        Atemp.append(np.sqrt(popt0 ** 2 + popt1 ** 2))
-                        PHtemp.append(np.arctan(popt1 / popt0))
-                        model = self._model(time, popt0, popt1, popt2, (j + 1) * fundamental_Freq)
-                        magnitude = np.array(magnitude) - model
-
-                    A.append(Atemp)
-                    PH.append(PHtemp)
-
-            elif not range2_present:
-                # extracting from range 2
-                for i in range(2):
-                    fundamental_Freq, power, fmax = get_significant_frequency(time, magnitude, lscargle_kwds, snr_threshold, window_size, range2)
-                    
-                    if fundamental_Freq is None:
-                        break
-                        
-                    Atemp, PHtemp = [], []
-                    omagnitude = magnitude
-                    freq.append(fundamental_Freq)
-
-                    for j in range(4):
-                        function_to_fit = self._yfunc_maker((j + 1) * fundamental_Freq)
-                        popt0, popt1, popt2 = curve_fit(function_to_fit, time, omagnitude)[0][:3]
-                        Atemp.append(np.sqrt(popt0 ** 2 + popt1 ** 2))
-                        PHtemp.append(np.arctan(popt1 / popt0))
-                        model = self._model(time, popt0, popt1, popt2, (j + 1) * fundamental_Freq)
-                        magnitude = np.array(magnitude) - model
-
-                    A.append(Atemp)
-                    PH.append(PHtemp)
-
-        PH = np.asarray(PH)
-        scaledPH = PH - PH[:, 0].reshape((len(PH), 1))
-
-        #print(freq)
-        return A, scaledPH, freq
-
-    def fit(self, magnitude, time, lscargle_kwds):
+            freq_range = None
+
+        # the residuals didn't change since the failed search, so searching
+        # the full grid again would fail the same way
+        if stopped and freq_range is None:
+            return self._amplitudes_and_phases(coefs) + (freq,)
+
+        # extracting 2 more frequencies based on the check
+        for i in range(3, 5):
+            fundamental_Freq, power, fmax = _get_significant_frequency(
+                ls_with_plan, magnitude, snr_threshold, window_size,
+                freq_range, freq[:i], duplicate_rtol, peak_width)
+
+            if fundamental_Freq is None:
+                break
+
+            freq[i] = fundamental_Freq
+            coefs[i] = self._extract_one(
+                fundamental_Freq, phase, magnitude, buffers)
+
+        return self._amplitudes_and_phases(coefs) + (freq,)
+
+    def fit(self, magnitude, time, lscargle_kwds, backend):
         lscargle_kwds = lscargle_kwds or {}
 
-        A, sPH, freq = self._components(magnitude, time, lscargle_kwds)
+        A, sPH, freq = self._components(
+            magnitude, time, lscargle_kwds, backend=backend)
         result = {}
 
         for i in range(5):
-            if i < len(freq):
-                for j in range(4):
-                    result[f"Freq{i+1}_harmonics_amplitude_{j}"] = A[i][j]
-                    result[f"Freq{i+1}_harmonics_rel_phase_{j}"] = sPH[i][j]
-                if i > 0:
-                    result[f"PeriodLS{i+1}"] = 1 / freq[i]
-            else:
-                for j in range(4):
-                    result[f"Freq{i+1}_harmonics_amplitude_{j}"] = None
-                    result[f"Freq{i+1}_harmonics_rel_phase_{j}"] = None
-                if i > 0:
-                    result[f"PeriodLS{i+1}"] = None
+            for j in range(4):
+                result[f"Freq{i+1}_harmonics_amplitude_{j}"] = (
+                    None if np.isnan(A[i, j]) else A[i, j])
+                result[f"Freq{i+1}_harmonics_rel_phase_{j}"] = (
+                    None if np.isnan(sPH[i, j]) else sPH[i, j])
+            if i > 0:
+                result[f"PeriodLS{i+1}"] = (
+                    None if np.isnan(freq[i]) else 1 / freq[i])
     
         return result
@@ -66,6 +66,10 @@ REQUIREMENTS = [
     "joblib",
 ]
 
+EXTRAS_REQUIREMENTS = {
+    "fast": ["nifty-ls"],
+}
+
 
 # =============================================================================
 # FUNCTIONS
@@ -100,6 +104,7 @@ def do_setup():
         packages=[pkg for pkg in find_packages() if pkg.startswith("feets")],
         py_modules=["ez_setup"],
         install_requires=REQUIREMENTS,
+        extras_require=EXTRAS_REQUIREMENTS,
     )
 
 
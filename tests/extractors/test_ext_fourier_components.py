@@ -35,8 +35,14 @@
 # IMPORTS
 # =============================================================================
 
+from collections import OrderedDict
+
 from feets import extractors
 
+import numpy as np
+
+from scipy import optimize, signal
+
 
 # =============================================================================
 # Test cases
@@ -52,3 +58,316 @@ def test_fourier_optional_data(periodic_lc_werror):
     assert ext.extract(features={}, **periodic_lc_werror) != ext.extract(
         features={}, **lc
     )
+
+
+def test_lscargle_fast_same_grid_as_lscargle(periodic_lc):
+    ext_fourier_components = extractors.ext_fourier_components
+
+    params = extractors.FourierComponents.get_default_params()
+    lscargle_kwds = params["lscargle_kwds"]
+
+    time = periodic_lc.time.astype(float)
+    magnitude = periodic_lc.magnitude
+
+    frequency, power, fmax = ext_fourier_components.lscargle(
+        time, magnitude, **lscargle_kwds
+    )
+    ffrequency, fpower, ffmax = ext_fourier_components._lscargle_fast(
+        time, magnitude, **lscargle_kwds
+    )
+
+    np.testing.assert_allclose(ffrequency, frequency)
+    np.testing.assert_allclose(fpower, power, atol=1e-3)
+    assert ffmax == fmax
+
+
+def test_lscargle_planner_same_as_lscargle_fast(periodic_lc):
+    ext_fourier_components = extractors.ext_fourier_components
+
+    params = extractors.FourierComponents.get_default_params()
+    lscargle_kwds = params["lscargle_kwds"]
+
+    time = periodic_lc.time.astype(float)
+    magnitude = periodic_lc.magnitude
+
+    ls_with_plan = ext_fourier_components._lscargle_planner(
+        time, **lscargle_kwds
+    )
+    for mag in (magnitude, magnitude ** 2):
+        frequency, power, fmax = ext_fourier_components._lscargle_fast(
+            time, mag, **lscargle_kwds
+        )
+        pfrequency, ppower, pfmax = ls_with_plan(mag)
+
+        # the planned transform runs in single precision
+        np.testing.assert_allclose(pfrequency, frequency)
+        np.testing.assert_allclose(ppower, power, atol=1e-3 * power.max())
+        assert abs(pfmax - fmax) <= 1
+
+
+def test_lscargle_planner_subgrid_same_as_lscargle(periodic_lc):
+    ext_fourier_components = extractors.ext_fourier_components
+
+    params = extractors.FourierComponents.get_default_params()
+    lscargle_kwds = params["lscargle_kwds"]
+
+    time = periodic_lc.time.astype(float)
+    magnitude = periodic_lc.magnitude
+
+    ls_with_plan = ext_fourier_components._lscargle_planner(
+        time, **lscargle_kwds
+    )
+    full_frequency, _, _ = ls_with_plan(magnitude)
+    pfrequency, ppower, pfmax = ls_with_plan(magnitude, [0.1, 0.3])
+
+    assert pfrequency[0] >= 0.1 and pfrequency[-1] <= 0.3
+    assert len(pfrequency) < len(full_frequency)
+
+    autopower_kwds = dict(
+        lscargle_kwds["autopower_kwds"],
+        minimum_frequency=pfrequency[0],
+        maximum_frequency=pfrequency[-1],
+    )
+    frequency, power, fmax = ext_fourier_components.lscargle(
+        time, magnitude, autopower_kwds=autopower_kwds
+    )
+
+    # the planned transform runs in single precision
+    np.testing.assert_allclose(pfrequency, frequency)
+    np.testing.assert_allclose(ppower, power, atol=1e-3 * power.max())
+    assert np.argmax(ppower) == np.argmax(power)
+
+    # a range outside of the grid has no frequencies at all
+    efrequency, epower, efmax = ls_with_plan(magnitude, [10.0, 20.0])
+    assert len(efrequency) == 0 and len(epower) == 0
+
+
+def test_fit_harmonics_same_as_least_squares(periodic_lc):
+    ext = extractors.FourierComponents()
+
+    time = periodic_lc.time.astype(float)
+    magnitude = periodic_lc.magnitude
+    phase = 2 * np.pi * time
+    Freq = 1.0 / 20
+
+    popts, model = ext._fit_harmonics(phase, magnitude, Freq)
+
+    expected_model = np.zeros_like(magnitude)
+    for j, popt in enumerate(popts, 1):
+        jac = np.column_stack(
+            (
+                np.sin(j * Freq * phase),
+                np.cos(j * Freq * phase),
+                np.ones_like(phase),
+            )
+        )
+        expected = optimize.least_squares(
+            lambda p: jac @ p - magnitude,
+            x0=[0, 0, np.mean(magnitude)],
+            jac=lambda p: jac,
+            method="lm",
+            x_scale="jac",
+        ).x
+        np.testing.assert_allclose(popt, expected, rtol=1e-6, atol=1e-9)
+        expected_model += jac @ expected
+
+    np.testing.assert_allclose(model, expected_model, atol=1e-9)
+
+
+def test_argmax_peak_same_as_find_peaks():
+    ext_fourier_components = extractors.ext_fourier_components
+    random = np.random.RandomState(42)
+
+    for _ in range(100):
+        power = random.uniform(size=random.randint(3, 500))
+        peaks, _ = signal.find_peaks(power)
+        expected = peaks[np.argmax(power[peaks])] if len(peaks) else -1
+        assert ext_fourier_components._argmax_peak(power) == expected
+
+    assert ext_fourier_components._argmax_peak(np.arange(10.0)) == -1
+
+    power = np.array([0.0, 3.0, 0.0, 2.0, 0.0, 1.0, 0.0])
+    allowed = np.array([True, False, True, True, True, True, True])
+    assert ext_fourier_components._argmax_peak(power, allowed) == 3
+
+
+def test_get_significant_frequency_skips_known_frequencies():
+    ext_fourier_components = extractors.ext_fourier_components
+
+    frequency = 0.1 * np.arange(1, 101)
+    power = np.full(frequency.size, 0.1)
+    power[[19, 49]] = [1.0, 0.5]
+
+    def ls(magnitude, freq_range=None):
+        return frequency, power, np.argmax(power)
+
+    freq, _, idx = ext_fourier_components._get_significant_frequency(
+        ls, None, snr_threshold=3, window_size=0.5
+    )
+    assert idx == 19
+
+    freq, _, idx = ext_fourier_components._get_significant_frequency(
+        ls, None, snr_threshold=3, window_size=0.5, known=[frequency[19]]
+    )
+    assert idx == 49
+
+    freq, _, idx = ext_fourier_components._get_significant_frequency(
+        ls, None, snr_threshold=6, window_size=0.5, known=[frequency[19]]
+    )
+    assert freq is None and idx is None
+
+
+def test_components_skip_leftovers_of_whitened_frequencies():
+    ext = extractors.FourierComponents()
+    params = ext.get_default_params()
+
+    random = np.random.RandomState(3)
+    time = np.sort(random.uniform(0, 300, 400))
+    magnitude = (
+        np.sin(2 * np.pi * 0.3 * time)
+        + 0.4 * np.sin(2 * np.pi * 0.05 * time)
+        + random.normal(0, 0.1, time.size)
+    )
+
+    A, sPH, freq = ext._components(magnitude, time, params["lscargle_kwds"])
+
+    # the leftovers of a whitened frequency peak within its main lobe
+    freq = freq[~np.isnan(freq)]
+    baseline = np.ptp(time)
+    distances = np.abs(freq[:, None] - freq[None, :])
+    np.fill_diagonal(distances, np.inf)
+    assert len(freq) >= 3
+    assert np.all(distances >= 1 / baseline)
+
+
+def test_warmup_shares_the_planned_periodogram(periodic_lc, monkeypatch):
+    ext_fourier_components = extractors.ext_fourier_components
+
+    monkeypatch.setattr(
+        ext_fourier_components, "_planner_cache", OrderedDict()
+    )
+
+    built = []
+    lscargle_planner = ext_fourier_components._lscargle_planner
+
+    def spy(*args, **kwargs):
+        built.append(args)
+        return lscargle_planner(*args, **kwargs)
+
+    monkeypatch.setattr(ext_fourier_components, "_lscargle_planner", spy)
+
+    ext = extractors.FourierComponents()
+    time = periodic_lc.time + 1000.0
+
+    ext.warmup(time)
+    assert len(ext_fourier_components._planner_cache) == 1
+    assert len(built) == 1
+
+    ext.extract(features={}, magnitude=periodic_lc.magnitude, time=time)
+    assert len(ext_fourier_components._planner_cache) == 1
+    assert len(built) == 1
+
+
+def test_components_stop_at_noise(periodic_lc):
+    ext = extractors.FourierComponents()
+    params = ext.get_default_params()
+
+    A, sPH, freq = ext._components(
+        periodic_lc.magnitude,
+        periodic_lc.time,
+        params["lscargle_kwds"],
+        snr_threshold=np.inf,
+    )
+
+    assert np.all(np.isnan(freq))
+    assert np.all(np.isnan(A)) and np.all(np.isnan(sPH))
+
+
+def test_amplitudes_and_phases_range():
+    ext = extractors.FourierComponents()
+
+    coefs = np.random.RandomState(42).uniform(-1, 1, size=(5, 4, 3))
+    A, sPH = ext._amplitudes_and_phases(coefs)
+
+    np.testing.assert_allclose(A, np.hypot(coefs[..., 0], coefs[..., 1]))
+    assert np.all(sPH >= -np.pi) and np.all(sPH <= np.pi)
+    np.testing.assert_allclose(sPH[:, 0], 0)
+
+
+def test_amplitudes_and_phases_quadrant():
+    ext = extractors.FourierComponents()
+
+    # a < 0 lies in the second quadrant, where arctan(b / a) would be off
+    # by pi
+    coefs = np.zeros((1, 2, 3))
+    coefs[0, 0] = [1.0, 0.0, 0.0]
+    coefs[0, 1] = [-1.0, 1.0, 0.0]
+    A, sPH = ext._amplitudes_and_phases(coefs)
+
+    np.testing.assert_allclose(A[0], [1.0, np.sqrt(2)])
+    np.testing.assert_allclose(sPH[0], [0.0, 3 * np.pi / 4])
+
+
+def test_components_search_missing_range_after_noise(monkeypatch):
+    ext_fourier_components = extractors.ext_fourier_components
+
+    # the second strongest peak is noise, but the missing range still has
+    # a significant frequency
+    def get_significant_frequency(ls, magnitude, snr_threshold,
+                                  window_size, freq_range, known,
+                                  duplicate_rtol, peak_width):
+        if freq_range is None:
+            found = 5.0
+        else:
+            assert freq_range == [0.4, 3.3]
+            found = 1.0
+        if found in known:
+            return None, None, None
+        return found, None, None
+
+    monkeypatch.setattr(
+        ext_fourier_components,
+        "_get_significant_frequency",
+        get_significant_frequency,
+    )
+
+    ext = extractors.FourierComponents()
+    time = np.linspace(0, 100, 200)
+    magnitude = np.sin(2 * np.pi * 5.0 * time) + np.sin(2 * np.pi * time)
+
+    A, sPH, freq = ext._components(magnitude, time, {})
+
+    np.testing.assert_array_equal(freq, [5.0, np.nan, np.nan, 1.0, np.nan])
+    assert np.all(np.isfinite(A[[0, 3]]))
+    assert np.all(np.isnan(A[[1, 2, 4]]))
+
+
+def test_components_skip_full_grid_after_noise(monkeypatch):
+    ext_fourier_components = extractors.ext_fourier_components
+
+    # both ranges are found before the residuals turn into noise
+    calls = []
+
+    def get_significant_frequency(ls, magnitude, snr_threshold,
+                                  window_size, freq_range, known,
+                                  duplicate_rtol, peak_width):
+        calls.append(freq_range)
+        for found in (1.0, 5.0):
+            if found not in known:
+                return found, None, None
+        return None, None, None
+
+    monkeypatch.setattr(
+        ext_fourier_components,
+        "_get_significant_frequency",
+        get_significant_frequency,
+    )
+
+    ext = extractors.FourierComponents()
+    time = np.linspace(0, 100, 200)
+    magnitude = np.sin(2 * np.pi * 5.0 * time) + np.sin(2 * np.pi * time)
+
+    A, sPH, freq = ext._components(magnitude, time, {})
+
+    np.testing.assert_array_equal(freq, [1.0, 5.0, np.nan, np.nan, np.nan])
+    assert calls == [None, None, None]